@@ -1,16 +1,106 @@
 # database.py
 import sqlite3
 import os
+import time
+import atexit
+import itertools
 from datetime import datetime, timedelta
 
+# Tables mirrored to kiosk replicas, with their primary keys
+TRACKED_TABLES = {
+    'books': 'book_id',
+    'members': 'member_id',
+    'issues': 'issue_id',
+    'holds': 'hold_id',
+}
+
+# Names for private shared-cache in-memory databases
+_memory_ids = itertools.count()
+
 class Database:
-    def __init__(self):
-        self.db_name = "library.db"
-        self.init_database()
+    def __init__(self, db_name="library.db", snapshot_path=None, snapshot_interval=None, create=True):
+        """Open a database file, a file: URI or ":memory:".
+
+        With create=False the tables are assumed to exist and are not created.
+        With snapshot_path, an in-memory database is loaded from that file if it
+        exists and written back to it through the backup API every
+        snapshot_interval seconds and on exit.
+        """
+        self.db_name = db_name
+        self.uri = db_name.startswith("file:")
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.last_snapshot = time.monotonic()
+        self.keepalive = None
+        
+        if db_name == ":memory:":
+            # Every plain :memory: connection is a new database, so share one by name
+            self.db_name = f"file:memdb{next(_memory_ids)}?mode=memory&cache=shared"
+            self.uri = True
+        
+        if snapshot_path and not self.uri and os.path.realpath(snapshot_path) == os.path.realpath(db_name):
+            # Snapshots replace the target file, which would clobber the live database
+            raise ValueError("snapshot_path must differ from the database file")
+        
+        if self.uri and "mode=memory" in self.db_name:
+            # A shared in-memory database only lives while a connection is open
+            self.keepalive = sqlite3.connect(self.db_name, uri=True)
+            if snapshot_path and os.path.exists(snapshot_path):
+                self.restore(snapshot_path)
+        
+        if create:
+            self.init_database()
+        if snapshot_path:
+            atexit.register(self.close)
+    
+    def connect(self):
+        # Periodic snapshots run between calls, when no other connection is busy
+        if self.snapshot_path and self.snapshot_interval and time.monotonic() - self.last_snapshot >= self.snapshot_interval:
+            try:
+                self.snapshot()
+            except (OSError, sqlite3.Error):
+                # e.g. the target is open elsewhere on Windows; the call itself must not
+                # fail, so try again next interval
+                self.last_snapshot = time.monotonic()
+        return sqlite3.connect(self.db_name, uri=self.uri)
+    
+    def snapshot(self, path=None):
+        """Copy the database to path (default snapshot_path) with the backup API"""
+        path = path or self.snapshot_path
+        if path is None:
+            raise ValueError("No snapshot path given and none configured")
+        tmp_path = path + ".tmp"
+        src = self.keepalive or sqlite3.connect(self.db_name, uri=self.uri)
+        dst = sqlite3.connect(tmp_path)
+        src.backup(dst)
+        dst.close()
+        if src is not self.keepalive:
+            src.close()
+        # Replace the old snapshot only once the new one is complete
+        os.replace(tmp_path, path)
+        self.last_snapshot = time.monotonic()
+    
+    def restore(self, path):
+        """Load a snapshot file into this database"""
+        src = sqlite3.connect(path)
+        dst = self.keepalive or sqlite3.connect(self.db_name, uri=self.uri)
+        src.backup(dst)
+        src.close()
+        if dst is not self.keepalive:
+            dst.close()
+    
+    def close(self):
+        """Write a final snapshot and release an in-memory database"""
+        if self.snapshot_path:
+            self.snapshot()
+            self.snapshot_path = None
+        if self.keepalive:
+            self.keepalive.close()
+            self.keepalive = None
     
     def init_database(self):
         """Initialize database and create tables"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         
         # Books table
@@ -55,12 +145,86 @@ class Database:
             )
         ''')
         
+        # Scanned returns look up the open issue for a book
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_issues_book_status
+            ON issues (book_id, status)
+        ''')
+        
+        # Holds table - one row per reservation, served FIFO within priority
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS holds (
+                hold_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                book_id INTEGER,
+                member_id INTEGER,
+                priority INTEGER DEFAULT 0,
+                placed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ready_date TIMESTAMP,
+                expiry_date TIMESTAMP,
+                status TEXT DEFAULT 'Waiting',
+                FOREIGN KEY (book_id) REFERENCES books (book_id),
+                FOREIGN KEY (member_id) REFERENCES members (member_id)
+            )
+        ''')
+        
+        # Next hold for a book is the first entry of this index, never a scan
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_holds_queue
+            ON holds (book_id, status, priority DESC, hold_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_holds_expiry
+            ON holds (status, expiry_date)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_holds_member
+            ON holds (member_id, status)
+        ''')
+        # A member can only hold one place in a book's queue at a time
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_holds_member_active
+            ON holds (book_id, member_id) WHERE status IN ('Waiting', 'Ready')
+        ''')
+        
+        # Change log - latest change per row, read by kiosk delta sync
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS row_changes (
+                change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                UNIQUE (table_name, row_id)
+            )
+        ''')
+        
+        # Kiosk journal entries already replayed here, committed with the replayed writes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS journal_applied (
+                kiosk_id TEXT NOT NULL,
+                entry_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                note TEXT,
+                remote_id INTEGER,
+                PRIMARY KEY (kiosk_id, entry_id)
+            )
+        ''')
+        
+        for table, key in TRACKED_TABLES.items():
+            for event, ref in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS log_{table}_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        INSERT OR REPLACE INTO row_changes (table_name, row_id)
+                        VALUES ('{table}', {ref}.{key});
+                    END
+                ''')
+        
         conn.commit()
         conn.close()
     
     # Book operations
     def add_book(self, title, author, publisher, isbn, copies):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         try:
             cursor.execute('''
@@ -75,7 +239,7 @@ class Database:
             conn.close()
     
     def get_all_books(self):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM books ORDER BY book_id')
         books = cursor.fetchall()
@@ -83,7 +247,7 @@ class Database:
         return books
     
     def search_books(self, search_term):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT * FROM books 
@@ -95,13 +259,10 @@ class Database:
     
     # Member operations
     def add_member(self, name, email, phone, address):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         try:
-            cursor.execute('''
-                INSERT INTO members (name, email, phone, address)
-                VALUES (?, ?, ?, ?)
-            ''', (name, email, phone, address))
+            self._add_member(cursor, name, email, phone, address)
             conn.commit()
             return True
         except sqlite3.IntegrityError:
@@ -109,8 +270,15 @@ class Database:
         finally:
             conn.close()
     
+    def _add_member(self, cursor, name, email, phone, address):
+        cursor.execute('''
+            INSERT INTO members (name, email, phone, address)
+            VALUES (?, ?, ?, ?)
+        ''', (name, email, phone, address))
+        return cursor.lastrowid
+    
     def get_all_members(self):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM members ORDER BY member_id')
         members = cursor.fetchall()
@@ -119,9 +287,17 @@ class Database:
     
     # Issue/Return operations
     def issue_book(self, book_id, member_id, days=14):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
-        
+        try:
+            issue_id = self._issue_book(cursor, book_id, member_id, days)
+            conn.commit()
+        finally:
+            conn.close()
+        return issue_id is not None
+    
+    def _issue_book(self, cursor, book_id, member_id, days):
+        """Issue a copy using an open cursor, returning the new issue_id"""
         # Check if book is available
         cursor.execute('SELECT available_copies FROM books WHERE book_id = ?', (book_id,))
         result = cursor.fetchone()
@@ -132,25 +308,30 @@ class Database:
                 INSERT INTO issues (book_id, member_id, due_date)
                 VALUES (?, ?, ?)
             ''', (book_id, member_id, due_date))
+            issue_id = cursor.lastrowid
             
             # Update available copies
             cursor.execute('''
                 UPDATE books SET available_copies = available_copies - 1 
                 WHERE book_id = ?
             ''', (book_id,))
-            
-            conn.commit()
-            conn.close()
-            return True
-        conn.close()
-        return False
+            return issue_id
+        return None
     
-    def return_book(self, issue_id):
-        conn = sqlite3.connect(self.db_name)
+    def return_book(self, issue_id, hold_days=3):
+        conn = self.connect()
         cursor = conn.cursor()
-        
-        # Get book_id from issue
-        cursor.execute('SELECT book_id FROM issues WHERE issue_id = ?', (issue_id,))
+        book_id = self._return_book(cursor, issue_id, hold_days)
+        conn.commit()
+        conn.close()
+        return book_id is not None
+    
+    def _return_book(self, cursor, issue_id, hold_days):
+        """Return an issued copy using an open cursor, returning its book_id"""
+        # Get book_id from issue - an issue can only be returned once
+        cursor.execute('''
+            SELECT book_id FROM issues WHERE issue_id = ? AND status = 'Issued'
+        ''', (issue_id,))
         result = cursor.fetchone()
         
         if result:
@@ -161,20 +342,16 @@ class Database:
                 WHERE issue_id = ?
             ''', (issue_id,))
             
-            # Update available copies
-            cursor.execute('''
-                UPDATE books SET available_copies = available_copies + 1 
-                WHERE book_id = ?
-            ''', (book_id,))
+            # Release lapsed holds first so their copies are not left locked
+            self._expire_holds(cursor, hold_days)
             
-            conn.commit()
-            conn.close()
-            return True
-        conn.close()
-        return False
+            # Hand the copy to the next hold, or put it back on the shelf
+            self._allocate_copy(cursor, book_id, hold_days)
+            return book_id
+        return None
     
     def get_active_issues(self):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT i.issue_id, b.title, m.name, i.issue_date, i.due_date 
@@ -189,7 +366,7 @@ class Database:
     
     def search_members(self, search_term):
         """Search members by name, email, or phone"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT * FROM members 
@@ -202,9 +379,14 @@ class Database:
     
     def delete_member(self, member_id):
         """Delete a member if they have no active issues"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
-        
+        deleted = self._delete_member(cursor, member_id)
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def _delete_member(self, cursor, member_id):
         # Check if member has active issues
         cursor.execute('''
             SELECT COUNT(*) FROM issues 
@@ -214,29 +396,37 @@ class Database:
         active_issues = cursor.fetchone()[0]
         
         if active_issues > 0:
-            conn.close()
             return False
         
         # Delete member
         cursor.execute('DELETE FROM members WHERE member_id = ?', (member_id,))
-        conn.commit()
-        conn.close()
+        if cursor.rowcount == 0:
+            return False
+        self._cancel_member_holds(cursor, member_id)
         return True
     
     def update_member_status(self, member_id, status):
         """Update member status (Active/Inactive)"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
+        updated = self._update_member_status(cursor, member_id, status)
+        conn.commit()
+        conn.close()
+        return updated
+    
+    def _update_member_status(self, cursor, member_id, status):
         cursor.execute('''
             UPDATE members SET status = ? WHERE member_id = ?
         ''', (status, member_id))
-        conn.commit()
-        conn.close()
+        if cursor.rowcount == 0:
+            return False
+        if status != 'Active':
+            self._cancel_member_holds(cursor, member_id)
         return True
 
     def get_member_by_id(self, member_id):
         """Get member details by ID"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM members WHERE member_id = ?', (member_id,))
         member = cursor.fetchone()
@@ -245,16 +435,45 @@ class Database:
     
     def get_book_by_id(self, book_id):
         """Get book details by ID"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM books WHERE book_id = ?', (book_id,))
         book = cursor.fetchone()
         conn.close()
         return book
     
+    def get_book_by_isbn(self, isbn):
+        """Get book details by exact ISBN"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM books WHERE isbn = ?', (isbn,))
+        book = cursor.fetchone()
+        conn.close()
+        return book
+    
+    def get_open_issue_for_book(self, book_id, member_id=None):
+        """Get the active issue of a book, earliest due first, optionally for one member"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        query = '''
+            SELECT i.issue_id, b.title, m.name, i.issue_date, i.due_date
+            FROM issues i
+            JOIN books b ON i.book_id = b.book_id
+            JOIN members m ON i.member_id = m.member_id
+            WHERE i.book_id = ? AND i.status = 'Issued'
+        '''
+        params = [book_id]
+        if member_id is not None:
+            query += ' AND i.member_id = ?'
+            params.append(member_id)
+        cursor.execute(query + ' ORDER BY i.due_date LIMIT 1', params)
+        issue = cursor.fetchone()
+        conn.close()
+        return issue
+    
     def get_member_issues(self, member_id):
         """Get active issues for a member"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT i.issue_id, b.title, i.issue_date, i.due_date 
@@ -264,4 +483,154 @@ class Database:
         ''', (member_id,))
         issues = cursor.fetchall()
         conn.close()
-        return issues
\ No newline at end of file
+        return issues
+    
+    # Hold operations
+    def _allocate_copy(self, cursor, book_id, hold_days):
+        """Give a freed copy to the next waiting hold, else make it available"""
+        cursor.execute('''
+            SELECT hold_id FROM holds
+            WHERE book_id = ? AND status = 'Waiting'
+            ORDER BY priority DESC, hold_id
+            LIMIT 1
+        ''', (book_id,))
+        result = cursor.fetchone()
+        
+        if result:
+            now = datetime.now()
+            cursor.execute('''
+                UPDATE holds SET status = 'Ready', ready_date = ?, expiry_date = ?
+                WHERE hold_id = ?
+            ''', (now.strftime("%Y-%m-%d %H:%M:%S"),
+                  (now + timedelta(days=hold_days)).strftime("%Y-%m-%d %H:%M:%S"),
+                  result[0]))
+            return result[0]
+        
+        cursor.execute('''
+            UPDATE books SET available_copies = available_copies + 1 
+            WHERE book_id = ?
+        ''', (book_id,))
+        return None
+    
+    def _cancel_member_holds(self, cursor, member_id, hold_days=3):
+        """Drop a member out of every hold queue, passing on copies set aside for them"""
+        cursor.execute('''
+            SELECT hold_id, book_id, status FROM holds
+            WHERE member_id = ? AND status IN ('Waiting', 'Ready')
+        ''', (member_id,))
+        holds = cursor.fetchall()
+        
+        for hold_id, book_id, status in holds:
+            cursor.execute("UPDATE holds SET status = 'Cancelled' WHERE hold_id = ?", (hold_id,))
+            if status == 'Ready':
+                self._allocate_copy(cursor, book_id, hold_days)
+    
+    def place_hold(self, book_id, member_id, priority=0):
+        """Reserve a book that has no available copies"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT available_copies FROM books WHERE book_id = ?', (book_id,))
+            book = cursor.fetchone()
+            cursor.execute('SELECT status FROM members WHERE member_id = ?', (member_id,))
+            member = cursor.fetchone()
+            
+            if not book or book[0] > 0 or not member or member[0] != 'Active':
+                return False
+            
+            # Local time, like ready_date and expiry_date; CURRENT_TIMESTAMP is UTC
+            cursor.execute('''
+                INSERT INTO holds (book_id, member_id, priority, placed_date)
+                VALUES (?, ?, ?, ?)
+            ''', (book_id, member_id, priority, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+        finally:
+            conn.close()
+    
+    def collect_hold(self, hold_id, days=14):
+        """Issue the copy set aside for a ready hold"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT book_id, member_id FROM holds
+            WHERE hold_id = ? AND status = 'Ready'
+        ''', (hold_id,))
+        result = cursor.fetchone()
+        
+        if result:
+            # The copy was never returned to available_copies, so issue it directly
+            due_date = datetime.now() + timedelta(days=days)
+            cursor.execute('''
+                INSERT INTO issues (book_id, member_id, due_date)
+                VALUES (?, ?, ?)
+            ''', (result[0], result[1], due_date.strftime("%Y-%m-%d %H:%M:%S")))
+            cursor.execute("UPDATE holds SET status = 'Collected' WHERE hold_id = ?", (hold_id,))
+            
+            conn.commit()
+            conn.close()
+            return True
+        conn.close()
+        return False
+    
+    def cancel_hold(self, hold_id, hold_days=3):
+        """Cancel a hold, passing its copy on if one was set aside"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT book_id, status FROM holds
+            WHERE hold_id = ? AND status IN ('Waiting', 'Ready')
+        ''', (hold_id,))
+        result = cursor.fetchone()
+        
+        if result:
+            cursor.execute("UPDATE holds SET status = 'Cancelled' WHERE hold_id = ?", (hold_id,))
+            if result[1] == 'Ready':
+                self._allocate_copy(cursor, result[0], hold_days)
+            
+            conn.commit()
+            conn.close()
+            return True
+        conn.close()
+        return False
+    
+    def expire_holds(self, hold_days=3):
+        """Expire uncollected ready holds and pass their copies on"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        expired = self._expire_holds(cursor, hold_days)
+        conn.commit()
+        conn.close()
+        return expired
+    
+    def _expire_holds(self, cursor, hold_days):
+        cursor.execute('''
+            SELECT hold_id, book_id FROM holds
+            WHERE status = 'Ready' AND expiry_date < ?
+        ''', (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+        expired = cursor.fetchall()
+        
+        for hold_id, book_id in expired:
+            cursor.execute("UPDATE holds SET status = 'Expired' WHERE hold_id = ?", (hold_id,))
+            self._allocate_copy(cursor, book_id, hold_days)
+        return len(expired)
+    
+    def get_active_holds(self):
+        """Get waiting and ready holds in queue order"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT h.hold_id, b.title, m.name, h.priority, h.status, h.placed_date, h.expiry_date
+            FROM holds h
+            JOIN books b ON h.book_id = b.book_id
+            JOIN members m ON h.member_id = m.member_id
+            WHERE h.status IN ('Waiting', 'Ready')
+            ORDER BY h.book_id, h.status, h.priority DESC, h.hold_id
+        ''')
+        holds = cursor.fetchall()
+        conn.close()
+        return holds
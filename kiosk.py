@@ -0,0 +1,405 @@
+# kiosk.py
+import sqlite3
+import json
+import uuid
+import urllib.request
+from datetime import datetime
+from database import Database, TRACKED_TABLES
+
+# Journaled writes: (table the op creates a row in, {arg position: table it references})
+JOURNAL_OPS = {
+    'add_member': ('members', {}),
+    'delete_member': (None, {0: 'members'}),
+    'update_member_status': (None, {0: 'members'}),
+    'issue_book': ('issues', {1: 'members'}),
+    'return_book': (None, {0: 'issues'}),
+}
+
+CONFLICT_NOTES = {
+    'add_member': "Email already registered on primary",
+    'delete_member': "Member has active issues or no longer exists",
+    'update_member_status': "Member no longer exists",
+    'issue_book': "No copies available on primary",
+    'return_book': "Issue already returned on primary",
+}
+
+# Reads served by the primary when online, by the replica when offline
+READ_METHODS = (
+    'get_all_books', 'search_books', 'get_all_members', 'search_members',
+    'get_member_by_id', 'get_book_by_id', 'get_book_by_isbn', 'get_open_issue_for_book',
+    'get_active_issues', 'get_member_issues', 'get_active_holds',
+)
+
+# Writes that are not journaled and need the primary
+PRIMARY_METHODS = ('add_book', 'place_hold', 'collect_hold', 'cancel_hold', 'expire_holds')
+
+
+class KioskDatabase:
+    """Database front end for kiosks that keeps working when the primary is unreachable.
+
+    While offline, reads come from a local replica and member/issue/return writes are
+    applied to the replica and appended to a journal. sync() replays the journal against
+    the primary in batches, then pulls rows changed since the last sync. Each online
+    write is pulled into the replica straight away; changes made by other clients reach
+    it on the next sync().
+    """
+
+    def __init__(self, primary_name="library.db", replica_name="kiosk_replica.db", batch_size=500):
+        self.primary_name = primary_name
+        self.batch_size = batch_size
+        self.replica = Database(replica_name)
+        self.primary = None
+        self.offline = True
+        self.kiosk_id = None
+        self.init_journal()
+        self.sync()
+
+    def init_journal(self):
+        """Create journal and sync state tables in the replica"""
+        conn = self.replica.connect()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS journal (
+                entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                args TEXT NOT NULL,
+                local_id INTEGER,
+                remote_id INTEGER,
+                status TEXT DEFAULT 'Pending',
+                note TEXT,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                synced_date TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        ''')
+
+        # Identifies this replica's journal entries in the primary's journal_applied table
+        cursor.execute('''
+            INSERT OR IGNORE INTO sync_state (key, value) VALUES ('kiosk_id', ?)
+        ''', (f"kiosk-{uuid.uuid4().hex}",))
+        cursor.execute("SELECT value FROM sync_state WHERE key = 'kiosk_id'")
+        self.kiosk_id = cursor.fetchone()[0]
+
+        conn.commit()
+        conn.close()
+
+    def __getattr__(self, name):
+        if name in READ_METHODS:
+            return lambda *args: self._read(name, *args)
+        if name in PRIMARY_METHODS:
+            return lambda *args: self._primary_write(name, *args)
+        raise AttributeError(name)
+
+    def _read(self, method, *args):
+        if not self.offline:
+            try:
+                return getattr(self.primary, method)(*args)
+            except sqlite3.OperationalError:
+                self.offline = True
+        return getattr(self.replica, method)(*args)
+
+    def _primary_write(self, method, *args):
+        if not self.offline:
+            try:
+                return self._catch_up(getattr(self.primary, method)(*args))
+            except sqlite3.OperationalError:
+                self.offline = True
+        return 0 if method == 'expire_holds' else False
+
+    def _catch_up(self, result):
+        """Pull a successful online write into the replica so it is there if the share drops"""
+        if result:
+            try:
+                self.pull_changes()
+            except sqlite3.OperationalError:
+                # The write stands; the next sync() catches the replica up
+                self.offline = True
+        return result
+
+    # Journaled writes
+    def add_member(self, name, email, phone, address):
+        return self._write('add_member', name, email, phone, address)
+
+    def delete_member(self, member_id):
+        return self._write('delete_member', int(member_id))
+
+    def update_member_status(self, member_id, status):
+        return self._write('update_member_status', int(member_id), status)
+
+    def issue_book(self, book_id, member_id, days=14):
+        return self._write('issue_book', int(book_id), int(member_id), days)
+
+    def return_book(self, issue_id, hold_days=3):
+        return self._write('return_book', int(issue_id), hold_days)
+
+    def _write(self, op, *args):
+        if not self.offline:
+            try:
+                return self._catch_up(getattr(self.primary, op)(*args))
+            except sqlite3.OperationalError:
+                self.offline = True
+        return self._journal(op, list(args))
+
+    def _apply(self, db, cursor, op, args):
+        """Apply a journaled op through db's cursor helpers; falsy result means it failed"""
+        return getattr(db, '_' + op)(cursor, *args)
+
+    def _journal(self, op, args):
+        """Apply a write to the replica and record it for replay in one transaction"""
+        conn = self.replica.connect()
+        cursor = conn.cursor()
+        try:
+            result = self._apply(self.replica, cursor, op, args)
+            if not result:
+                return False
+
+            local_id = result if JOURNAL_OPS[op][0] else None
+            cursor.execute('''
+                INSERT INTO journal (op, args, local_id) VALUES (?, ?, ?)
+            ''', (op, json.dumps(args), local_id))
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+        finally:
+            conn.close()
+
+    # Sync
+    def connect_primary(self):
+        """Open the primary if it exists; never create it or its tables from a kiosk"""
+        if self.primary_name.startswith("file:"):
+            uri = self.primary_name
+        else:
+            uri = "file:" + urllib.request.pathname2url(self.primary_name)
+        # mode=rw fails on a missing file, where the default would create an empty one
+        uri += ("&" if "?" in uri else "?") + "mode=rw"
+
+        try:
+            primary = Database(uri, create=False)
+            conn = primary.connect()
+            conn.execute('SELECT 1 FROM row_changes LIMIT 1')
+            conn.close()
+        except sqlite3.DatabaseError:
+            return False
+        self.primary = primary
+        return True
+
+    def sync(self):
+        """Replay the journal, catch up from the primary and go back online.
+
+        Returns a dict of counts, or None if the primary is still unreachable.
+        """
+        if self.primary is None and not self.connect_primary():
+            return None
+
+        try:
+            applied, conflicts = self.push_journal()
+            pulled = self.pull_changes()
+        except sqlite3.OperationalError:
+            self.offline = True
+            return None
+
+        self.offline = False
+        return {'applied': applied, 'conflicts': conflicts, 'pulled': pulled}
+
+    def push_journal(self):
+        """Replay pending journal entries against the primary, one transaction per batch"""
+        applied = conflicts = 0
+        id_map = self._load_id_map()
+
+        while True:
+            rconn = self.replica.connect()
+            entries = rconn.execute('''
+                SELECT entry_id, op, args, local_id FROM journal
+                WHERE status = 'Pending' ORDER BY entry_id LIMIT ?
+            ''', (self.batch_size,)).fetchall()
+            if not entries:
+                rconn.close()
+                return applied, conflicts
+
+            pconn = self.primary.connect()
+            cursor = pconn.cursor()
+            results = []
+
+            # Entries the primary already applied in a batch whose journal update was lost
+            cursor.execute('''
+                SELECT entry_id, status, note, remote_id FROM journal_applied
+                WHERE kiosk_id = ? AND entry_id BETWEEN ? AND ?
+            ''', (self.kiosk_id, entries[0][0], entries[-1][0]))
+            recorded = {row[0]: row[1:] for row in cursor.fetchall()}
+
+            for entry_id, op, args, local_id in entries:
+                creates, refs = JOURNAL_OPS[op]
+
+                if entry_id in recorded:
+                    status, note, remote_id = recorded[entry_id]
+                else:
+                    status, note, remote_id = self._replay(cursor, op, json.loads(args), id_map)
+                    cursor.execute('''
+                        INSERT INTO journal_applied (kiosk_id, entry_id, status, note, remote_id)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (self.kiosk_id, entry_id, status, note, remote_id))
+
+                if creates:
+                    id_map[(creates, local_id)] = remote_id
+
+                if status == 'Applied':
+                    applied += 1
+                else:
+                    conflicts += 1
+                results.append((status, note, remote_id, entry_id))
+
+            # The ledger rows commit with the replayed writes, so a retry skips them
+            pconn.commit()
+            pconn.close()
+
+            rconn.executemany('''
+                UPDATE journal SET status = ?, note = ?, remote_id = ? WHERE entry_id = ?
+            ''', results)
+            rconn.commit()
+            rconn.close()
+
+    def _replay(self, cursor, op, args, id_map):
+        """Apply one journal entry to the primary, returning (status, note, remote_id)"""
+        creates, refs = JOURNAL_OPS[op]
+
+        # Rows created offline are known to the primary under different ids
+        for pos, table in refs.items():
+            key = (table, args[pos])
+            if key in id_map:
+                args[pos] = id_map[key]
+                if args[pos] is None:
+                    return 'Conflict', f"Depends on a conflicted offline {table[:-1]}", None
+
+        # The issue helpers only check copies, so check the borrower separately
+        if op == 'issue_book':
+            cursor.execute('SELECT status FROM members WHERE member_id = ?', (args[1],))
+            member = cursor.fetchone()
+            if not member or member[0] != 'Active':
+                return 'Conflict', "Member deleted or inactive on primary", None
+
+        try:
+            result = self._apply(self.primary, cursor, op, args)
+        except sqlite3.IntegrityError:
+            result = None
+        if not result:
+            return 'Conflict', CONFLICT_NOTES[op], None
+        return 'Applied', None, result if creates else None
+
+    def _load_id_map(self):
+        """Local to primary ids for offline-created rows replayed but not yet synced"""
+        conn = self.replica.connect()
+        rows = conn.execute('''
+            SELECT op, local_id, remote_id FROM journal
+            WHERE local_id IS NOT NULL AND status != 'Pending' AND synced_date IS NULL
+        ''').fetchall()
+        conn.close()
+        return {(JOURNAL_OPS[op][0], local_id): remote_id for op, local_id, remote_id in rows}
+
+    def pull_changes(self):
+        """Copy rows changed on the primary since the high-water mark into the replica.
+
+        Rows touched locally while offline are refreshed as well, so the replica ends up
+        matching the primary. The first sync copies every tracked table.
+        """
+        pconn = self.primary.connect()
+        rconn = self.replica.connect()
+        rcursor = rconn.cursor()
+
+        rcursor.execute("SELECT value FROM sync_state WHERE key = 'high_water_mark'")
+        result = rcursor.fetchone()
+
+        # Read the mark first; anything changed while copying is picked up next time
+        new_mark = pconn.execute('SELECT COALESCE(MAX(change_id), 0) FROM row_changes').fetchone()[0]
+        pulled = 0
+
+        if result is None:
+            for table in TRACKED_TABLES:
+                rows = pconn.execute(f'SELECT * FROM {table}').fetchall()
+                rcursor.execute(f'DELETE FROM {table}')
+                if rows:
+                    placeholders = ', '.join('?' * len(rows[0]))
+                    rcursor.executemany(f'INSERT INTO {table} VALUES ({placeholders})', rows)
+                pulled += len(rows)
+        else:
+            changed = {table: set() for table in TRACKED_TABLES}
+            for table, row_id in pconn.execute('''
+                SELECT table_name, row_id FROM row_changes WHERE change_id > ? AND change_id <= ?
+            ''', (result[0], new_mark)):
+                changed[table].add(row_id)
+            for table, row_id in rcursor.execute('SELECT table_name, row_id FROM row_changes').fetchall():
+                changed[table].add(row_id)
+
+            for table, row_ids in changed.items():
+                pulled += self._refresh_rows(pconn, rcursor, table, sorted(row_ids))
+
+        # The replica's own change log only tracks offline writes since the last sync
+        rcursor.execute('DELETE FROM row_changes')
+        rcursor.execute('''
+            INSERT OR REPLACE INTO sync_state (key, value) VALUES ('high_water_mark', ?)
+        ''', (new_mark,))
+        rcursor.execute('''
+            UPDATE journal SET synced_date = ? WHERE status != 'Pending' AND synced_date IS NULL
+        ''', (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+        # Applied entries are no longer needed; conflicts are kept for staff review
+        rcursor.execute("DELETE FROM journal WHERE status = 'Applied'")
+
+        rconn.commit()
+        rconn.close()
+        pconn.close()
+        return pulled
+
+    def _refresh_rows(self, pconn, rcursor, table, row_ids, chunk_size=500):
+        key = TRACKED_TABLES[table]
+        pulled = 0
+
+        chunks = [row_ids[i:i + chunk_size] for i in range(0, len(row_ids), chunk_size)]
+
+        # Clear every changed row before inserting any, so a UNIQUE email or isbn that
+        # moved between rows in different chunks cannot collide with a stale copy.
+        # Rows missing on the primary were deleted there or only ever existed offline.
+        for chunk in chunks:
+            placeholders = ', '.join('?' * len(chunk))
+            rcursor.execute(f'DELETE FROM {table} WHERE {key} IN ({placeholders})', chunk)
+
+        for chunk in chunks:
+            placeholders = ', '.join('?' * len(chunk))
+            rows = pconn.execute(f'SELECT * FROM {table} WHERE {key} IN ({placeholders})', chunk).fetchall()
+            if rows:
+                row_placeholders = ', '.join('?' * len(rows[0]))
+                rcursor.executemany(f'INSERT INTO {table} VALUES ({row_placeholders})', rows)
+            pulled += len(rows)
+        return pulled
+
+    def get_conflicts(self):
+        """Get journal entries that could not be applied to the primary"""
+        conn = self.replica.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT entry_id, op, args, note, created_date FROM journal
+            WHERE status = 'Conflict' ORDER BY entry_id
+        ''')
+        conflicts = cursor.fetchall()
+        conn.close()
+        return conflicts
+
+    def dismiss_conflict(self, entry_id):
+        """Remove a conflict once staff have dealt with it"""
+        conn = self.replica.connect()
+        cursor = conn.cursor()
+        # Unsynced conflicts still map offline ids for entries behind them
+        cursor.execute('''
+            DELETE FROM journal
+            WHERE entry_id = ? AND status = 'Conflict' AND synced_date IS NOT NULL
+        ''', (entry_id,))
+        conn.commit()
+        deleted = cursor.rowcount > 0
+        conn.close()
+        return deleted
@@ -2,17 +2,52 @@
 import customtkinter as ctk
 from tkinter import ttk, messagebox
 from database import Database
-from datetime import datetime
+from kiosk import KioskDatabase
+from scanner import ScanBuffer
+from datetime import datetime, timedelta
 
 class LibraryManagementSystem:
-    def __init__(self):
-        self.db = Database()
+    HOLD_EXPIRY_INTERVAL = 60 * 1000
+    MAX_DUE_DAYS = 365
+    
+    def __init__(self, db=None, sync_interval=30):
+        self.db = db or Database()
         self.root = ctk.CTk()
         self.root.title("Library Management System")
         self.root.geometry("1200x700")
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
+        self.scan_binding = None
         self.setup_ui()
+        self.root.after(self.HOLD_EXPIRY_INTERVAL, self.expire_holds)
+        if isinstance(self.db, KioskDatabase):
+            self.sync_interval = sync_interval * 1000
+            self.update_kiosk_title()
+            self.root.after(self.sync_interval, self.sync_kiosk)
+    
+    def expire_holds(self):
+        # Uncollected holds lapse on time even if nobody opens the Holds screen
+        try:
+            self.db.expire_holds()
+        finally:
+            self.root.after(self.HOLD_EXPIRY_INTERVAL, self.expire_holds)
+    
+    def sync_kiosk(self):
+        # Replays offline writes once the primary is reachable again
+        try:
+            self.db.sync()
+            self.update_kiosk_title()
+        finally:
+            self.root.after(self.sync_interval, self.sync_kiosk)
+    
+    def update_kiosk_title(self):
+        title = "Library Management System"
+        if self.db.offline:
+            title += " (Offline)"
+        conflicts = len(self.db.get_conflicts())
+        if conflicts:
+            title += f" - {conflicts} sync conflict{'s' if conflicts > 1 else ''}"
+        self.root.title(title)
     
     def setup_ui(self):
         self.main_frame = ctk.CTkFrame(self.root)
@@ -35,14 +70,18 @@ class LibraryManagementSystem:
             ("👥 Members", self.show_members),
             ("📖 Issue", self.show_issue),
             ("↩️ Return", self.show_return),
+            ("🔖 Holds", self.show_holds),
             ("📋 Issues", self.show_issues),
         ]
+        if isinstance(self.db, KioskDatabase):
+            nav_items.append(("⚠️ Sync Conflicts", self.show_conflicts))
         
         for text, cmd in nav_items:
             btn = ctk.CTkButton(sidebar, text=text, command=cmd, anchor="w", fg_color="transparent")
             btn.pack(fill="x", padx=10, pady=5)
     
     def clear_content(self):
+        self.stop_scan_mode()
         for widget in self.content_frame.winfo_children():
             widget.destroy()
     
@@ -275,15 +314,18 @@ class LibraryManagementSystem:
         
         self.issue_btn = ctk.CTkButton(details_frame, text="Issue Book", command=self.issue_book, state="disabled")
         self.issue_btn.pack(fill="x", pady=5)
+        self.setup_scan_mode(details_frame, self.on_issue_scan, (self.member_search, self.book_search, self.due_days))
         
         self.selected_member = None
         self.selected_book = None
         self.update_issue_lists()
     
     def search_members_issue(self, event=None):
+        if self.scan_switch.get(): return
         self.update_issue_lists()
     
     def search_books_issue(self, event=None):
+        if self.scan_switch.get(): return
         self.update_issue_lists()
     
     def update_issue_lists(self):
@@ -318,8 +360,8 @@ class LibraryManagementSystem:
         
         try:
             days = int(self.due_days.get())
-            if days <= 0:
-                messagebox.showerror("Error", "Due days must be positive")
+            if days <= 0 or days > self.MAX_DUE_DAYS:
+                messagebox.showerror("Error", f"Due days must be between 1 and {self.MAX_DUE_DAYS}")
                 return
             
             if self.db.issue_book(self.selected_book[0], self.selected_member[0], days):
@@ -381,15 +423,17 @@ class LibraryManagementSystem:
         
         self.return_btn = ctk.CTkButton(right_frame, text="Process Return", command=self.process_return, state="disabled")
         self.return_btn.pack(fill="x", padx=10, pady=10)
+        self.setup_scan_mode(right_frame, self.on_return_scan)
         
         self.selected_issue = None
+        self.scan_member = None
         self.load_active_issues()
     
     def load_active_issues(self):
         for item in self.issues_tree.get_children():
             self.issues_tree.delete(item)
         for issue in self.db.get_active_issues():
-            self.issues_tree.insert("", "end", values=(issue[0], issue[1], issue[2], issue[4].split()[0]))
+            self.issues_tree.insert("", "end", iid=str(issue[0]), values=(issue[0], issue[1], issue[2], issue[4].split()[0]))
     
     def on_issue_select(self, event):
         selection = self.issues_tree.selection()
@@ -411,6 +455,236 @@ class LibraryManagementSystem:
                 self.selected_issue = None
                 self.return_btn.configure(state="disabled")
     
+    # Barcode scanning - scans resolve with exact lookups and skip list refreshes
+    def setup_scan_mode(self, parent, on_scan, entries=()):
+        self.scan_buffer = ScanBuffer()
+        self.scan_handler = on_scan
+        self.scan_entries = entries
+        self.scan_switch = ctk.CTkSwitch(parent, text="Scan mode", command=self.toggle_scan_mode)
+        self.scan_switch.pack(anchor="w", padx=10, pady=10)
+    
+    def toggle_scan_mode(self):
+        if self.scan_switch.get():
+            self.scan_binding = self.root.bind("<KeyPress>", self.on_scan_key, add="+")
+            # Entry class bindings run before the root's, so stop keys at each entry;
+            # fields can be edited again once scan mode is off
+            for entry in self.scan_entries:
+                entry.bind("<KeyPress>", self.on_scan_entry_key)
+            self.root.focus_set()
+        else:
+            self.stop_scan_mode()
+    
+    def stop_scan_mode(self):
+        if self.scan_binding:
+            self.root.unbind("<KeyPress>", self.scan_binding)
+            self.scan_binding = None
+            for entry in self.scan_entries:
+                entry.unbind("<KeyPress>")
+    
+    def on_scan_key(self, event):
+        code = self.scan_buffer.feed(event)
+        if code:
+            self.scan_handler(code)
+    
+    def on_scan_entry_key(self, event):
+        self.on_scan_key(event)
+        return "break"
+    
+    def show_scan_result(self, textbox, message):
+        textbox.configure(state="normal")
+        textbox.delete("1.0", "end")
+        textbox.insert("1.0", message)
+        textbox.configure(state="disabled")
+    
+    def scan_member_card(self, code):
+        """Look up a member card by member ID, whatever the member's status"""
+        return self.db.get_member_by_id(int(code))
+    
+    def on_issue_scan(self, code):
+        book = self.db.get_book_by_isbn(code)
+        
+        if not book and code.isdigit():
+            member = self.scan_member_card(code)
+            if member and member[6] == 'Active':
+                self.selected_member = member
+                message = f"Member: {member[1]}\nScan books to issue"
+            else:
+                # A failed card scan must not leave the previous patron selected
+                self.selected_member = None
+                message = f"Member inactive: {member[1]}" if member else f"Unknown member card: {code}"
+        elif not book:
+            message = f"Unknown barcode: {code}"
+        elif not self.selected_member:
+            message = f"Book: {book[1]}\nScan member card first"
+        else:
+            try:
+                days = int(self.due_days.get())
+            except ValueError:
+                days = 0
+            if days <= 0 or days > self.MAX_DUE_DAYS:
+                message = f"Due days must be between 1 and {self.MAX_DUE_DAYS}"
+            elif self.db.issue_book(book[0], self.selected_member[0], days):
+                due_date = (datetime.now() + timedelta(days=days)).strftime("%Y-%m-%d")
+                message = f"Issued: {book[1]}\nTo: {self.selected_member[1]}\nDue: {due_date}"
+            else:
+                message = f"No copies of {book[1]} available"
+        self.show_scan_result(self.summary_text, message)
+    
+    def on_return_scan(self, code):
+        book = self.db.get_book_by_isbn(code)
+        
+        if not book and code.isdigit():
+            # Inactive members can still return what they borrowed
+            self.scan_member = self.scan_member_card(code)
+            if self.scan_member:
+                message = f"Member: {self.scan_member[1]}\nScan books to return"
+            else:
+                message = f"Unknown member card: {code}"
+        elif not book:
+            message = f"Unknown barcode: {code}"
+        else:
+            issue = self.db.get_open_issue_for_book(book[0], self.scan_member[0] if self.scan_member else None)
+            if issue and self.db.return_book(issue[0]):
+                if self.issues_tree.exists(str(issue[0])):
+                    self.issues_tree.delete(str(issue[0]))
+                message = f"Returned: {issue[1]}\nFrom: {issue[2]}"
+            else:
+                message = f"{book[1]} is not on loan"
+        self.show_scan_result(self.details_text, message)
+    
+    def show_holds(self):
+        self.clear_content()
+        ctk.CTkLabel(self.content_frame, text="Holds", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
+        
+        # Place hold form
+        form_frame = ctk.CTkFrame(self.content_frame)
+        form_frame.pack(fill="x", padx=20, pady=10)
+        ctk.CTkLabel(form_frame, text="Place Hold", font=ctk.CTkFont(weight="bold")).pack(anchor="w", pady=10)
+        
+        entries_frame = ctk.CTkFrame(form_frame)
+        entries_frame.pack(fill="x", padx=10, pady=10)
+        self.hold_entries = {}
+        
+        for i, field in enumerate(["Member ID", "Book ID"]):
+            ctk.CTkLabel(entries_frame, text=field).grid(row=0, column=i*2, padx=5, pady=5, sticky="w")
+            entry = ctk.CTkEntry(entries_frame, width=120)
+            entry.grid(row=0, column=i*2+1, padx=5, pady=5)
+            self.hold_entries[field.split()[0].lower()] = entry
+        
+        self.hold_priority = ctk.CTkCheckBox(entries_frame, text="Priority (staff / accessibility)")
+        self.hold_priority.grid(row=0, column=4, padx=10, pady=5)
+        ctk.CTkButton(entries_frame, text="Place Hold", command=self.place_hold).grid(row=0, column=5, padx=5, pady=5)
+        
+        # Holds list
+        list_frame = ctk.CTkFrame(self.content_frame)
+        list_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        ctk.CTkLabel(list_frame, text="Active Holds", font=ctk.CTkFont(weight="bold")).pack(anchor="w", pady=10)
+        
+        columns = ("ID", "Book", "Member", "Priority", "Status", "Placed", "Collect By")
+        self.holds_tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=12)
+        for col in columns:
+            self.holds_tree.heading(col, text=col)
+            self.holds_tree.column(col, width=100)
+        self.holds_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # Action buttons
+        action_frame = ctk.CTkFrame(list_frame)
+        action_frame.pack(fill="x", padx=10, pady=5)
+        ctk.CTkButton(action_frame, text="Refresh", command=self.load_holds).pack(side="left", padx=5)
+        ctk.CTkButton(action_frame, text="Cancel Hold", command=self.cancel_hold, fg_color="#D32F2F").pack(side="right", padx=5)
+        ctk.CTkButton(action_frame, text="Collect", command=self.collect_hold, fg_color="#4CAF50").pack(side="right", padx=5)
+        
+        self.load_holds()
+    
+    def place_hold(self):
+        try:
+            member_id = int(self.hold_entries['member'].get())
+            book_id = int(self.hold_entries['book'].get())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter valid member and book IDs")
+            return
+        
+        priority = 1 if self.hold_priority.get() else 0
+        if self.db.place_hold(book_id, member_id, priority):
+            messagebox.showinfo("Success", "Hold placed!")
+            for entry in self.hold_entries.values():
+                entry.delete(0, 'end')
+            self.hold_priority.deselect()
+            self.load_holds()
+        else:
+            messagebox.showerror("Error", "Cannot place hold - book available, member inactive or already holding it")
+    
+    def load_holds(self):
+        self.db.expire_holds()
+        for item in self.holds_tree.get_children():
+            self.holds_tree.delete(item)
+        for hold in self.db.get_active_holds():
+            formatted = list(hold)
+            formatted[3] = "Yes" if formatted[3] else "No"
+            if formatted[5]: formatted[5] = formatted[5].split()[0]
+            formatted[6] = formatted[6].split()[0] if formatted[6] else ""
+            self.holds_tree.insert("", "end", values=formatted, tags=(formatted[4],))
+        self.holds_tree.tag_configure('Ready', background='#e8f5e8')
+    
+    def collect_hold(self):
+        selected = self.holds_tree.selection()
+        if not selected: return
+        hold_data = self.holds_tree.item(selected[0], 'values')
+        if self.db.collect_hold(hold_data[0]):
+            messagebox.showinfo("Success", f"{hold_data[1]} issued to {hold_data[2]}")
+            self.load_holds()
+        else:
+            messagebox.showerror("Error", "Hold is not ready for collection")
+    
+    def cancel_hold(self):
+        selected = self.holds_tree.selection()
+        if not selected: return
+        hold_data = self.holds_tree.item(selected[0], 'values')
+        if messagebox.askyesno("Confirm", f"Cancel hold on {hold_data[1]} for {hold_data[2]}?"):
+            if self.db.cancel_hold(hold_data[0]):
+                messagebox.showinfo("Success", "Hold cancelled!")
+                self.load_holds()
+    
+    def show_conflicts(self):
+        self.clear_content()
+        ctk.CTkLabel(self.content_frame, text="Sync Conflicts", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
+        ctk.CTkLabel(self.content_frame, text="Offline changes the shared database rejected. Resolve each one at the desk, then dismiss it.").pack(anchor="w", padx=20)
+        
+        list_frame = ctk.CTkFrame(self.content_frame)
+        list_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        columns = ("ID", "Operation", "Details", "Reason", "Recorded")
+        self.conflicts_tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=15)
+        for col in columns:
+            self.conflicts_tree.heading(col, text=col)
+            self.conflicts_tree.column(col, width=150)
+        self.conflicts_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # Action buttons
+        action_frame = ctk.CTkFrame(list_frame)
+        action_frame.pack(fill="x", padx=10, pady=5)
+        ctk.CTkButton(action_frame, text="Refresh", command=self.load_conflicts).pack(side="left", padx=5)
+        ctk.CTkButton(action_frame, text="Dismiss", command=self.dismiss_conflict, fg_color="#D32F2F").pack(side="right", padx=5)
+        
+        self.load_conflicts()
+    
+    def load_conflicts(self):
+        for item in self.conflicts_tree.get_children():
+            self.conflicts_tree.delete(item)
+        for entry_id, op, args, note, created_date in self.db.get_conflicts():
+            self.conflicts_tree.insert("", "end", values=(entry_id, op.replace("_", " ").title(), args, note, created_date))
+        self.update_kiosk_title()
+    
+    def dismiss_conflict(self):
+        selected = self.conflicts_tree.selection()
+        if not selected: return
+        conflict_data = self.conflicts_tree.item(selected[0], 'values')
+        if messagebox.askyesno("Confirm", f"Dismiss conflict {conflict_data[0]} ({conflict_data[1]})?"):
+            if self.db.dismiss_conflict(conflict_data[0]):
+                self.load_conflicts()
+            else:
+                messagebox.showerror("Error", "Conflict is still waiting for a sync")
+    
     def show_issues(self):
         self.clear_content()
         ctk.CTkLabel(self.content_frame, text="Active Issues", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
@@ -457,6 +731,33 @@ class LibraryManagementSystem:
         self.root.mainloop()
 
 if __name__ == "__main__":
+    import argparse
+    import os
     from datetime import timedelta
-    app = LibraryManagementSystem()
+    
+    parser = argparse.ArgumentParser(description="Library Management System")
+    parser.add_argument("--kiosk", metavar="REPLICA", help="run in offline-capable kiosk mode with a local replica file")
+    parser.add_argument("--db", default="library.db", help="path or file: URI of the shared library database")
+    parser.add_argument("--memory", action="store_true", help="run in memory, saving to --snapshot; starts from a copy of --db if the snapshot does not exist yet")
+    parser.add_argument("--snapshot", metavar="PATH", help="snapshot file for --memory mode, never the live --db")
+    parser.add_argument("--snapshot-interval", type=int, default=60, help="seconds between snapshots in --memory mode")
+    args = parser.parse_args()
+    
+    if args.memory and not args.snapshot:
+        parser.error("--memory requires --snapshot PATH")
+    if args.memory and os.path.realpath(args.snapshot) == os.path.realpath(args.db):
+        parser.error("--snapshot must differ from --db, which other clients may be writing to")
+    
+    if args.kiosk:
+        db = KioskDatabase(args.db, args.kiosk)
+    elif args.memory:
+        seed = not os.path.exists(args.snapshot)
+        db = Database(":memory:", snapshot_path=args.snapshot, snapshot_interval=args.snapshot_interval)
+        if seed and os.path.exists(args.db):
+            db.restore(args.db)
+            # The backup replaces the whole schema; add tables an older --db lacks
+            db.init_database()
+    else:
+        db = Database(args.db)
+    app = LibraryManagementSystem(db)
     app.run()
\ No newline at end of file
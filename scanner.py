@@ -0,0 +1,33 @@
+# scanner.py
+
+class ScanBuffer:
+    """Recognise barcode scanner bursts in a stream of key presses.
+
+    USB scanners type a whole code within a few milliseconds and finish with
+    Return; people type much slower. Keys arriving further apart than max_gap
+    start a new burst, so manual typing never completes a scan. The timing alone
+    separates scans from typing, so even one-digit member cards are accepted.
+    """
+
+    def __init__(self, max_gap=50, min_length=1):
+        self.max_gap = max_gap  # milliseconds, matching Tk event.time
+        self.min_length = min_length
+        self.chars = []
+        self.last_time = None
+
+    def feed(self, event):
+        """Feed a Tk key event; returns the scanned code when a burst completes"""
+        gap_ok = self.last_time is not None and event.time - self.last_time <= self.max_gap
+        self.last_time = event.time
+
+        if event.keysym in ("Return", "KP_Enter"):
+            code = "".join(self.chars) if gap_ok and len(self.chars) >= self.min_length else None
+            self.chars = []
+            return code
+
+        if not event.char or not event.char.isprintable():
+            return None
+        if not gap_ok:
+            self.chars = []
+        self.chars.append(event.char)
+        return None
@@ -0,0 +1,62 @@
+# test_database.py
+import pytest
+from database import Database
+
+
+def test_memory_databases_are_isolated():
+    first = Database(":memory:")
+    second = Database(":memory:")
+    first.add_book("Dune", "Herbert", "Ace", "9780441013593", 1)
+
+    assert len(first.get_all_books()) == 1
+    assert second.get_all_books() == []
+
+
+def test_shared_cache_uri_handles_see_same_data():
+    uri = "file:test_shared_cache?mode=memory&cache=shared"
+    first = Database(uri)
+    second = Database(uri)
+    first.add_member("Ann", "ann@example.com", "", "")
+
+    assert [m[1] for m in second.get_all_members()] == ["Ann"]
+
+
+def test_snapshot_and_restore_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    db = Database(":memory:", snapshot_path=path)
+    db.add_book("Dune", "Herbert", "Ace", "9780441013593", 1)
+    db.close()
+
+    restored = Database(":memory:", snapshot_path=path)
+    assert [b[1] for b in restored.get_all_books()] == ["Dune"]
+
+    copy = Database(":memory:")
+    copy.restore(path)
+    assert [b[1] for b in copy.get_all_books()] == ["Dune"]
+
+
+def test_periodic_snapshot_is_taken_between_calls(tmp_path):
+    path = tmp_path / "snapshot.db"
+    db = Database(":memory:", snapshot_path=str(path), snapshot_interval=0.001)
+    db.last_snapshot -= 1
+
+    db.get_all_books()
+    assert path.exists()
+
+
+def test_snapshot_path_must_differ_from_live_file(tmp_path):
+    path = str(tmp_path / "library.db")
+
+    with pytest.raises(ValueError):
+        Database(path, snapshot_path=path)
+
+
+def test_snapshot_without_path_raises_value_error(tmp_path):
+    db = Database(":memory:")
+    with pytest.raises(ValueError):
+        db.snapshot()
+
+    closed = Database(":memory:", snapshot_path=str(tmp_path / "snapshot.db"))
+    closed.close()
+    with pytest.raises(ValueError):
+        closed.snapshot()
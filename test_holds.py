@@ -0,0 +1,124 @@
+# test_holds.py
+from database import Database
+
+
+def make_library():
+    """One copy of Dune, on loan to Ann (member 1), with Ben, Cat and Dan waiting to join the queue"""
+    db = Database(":memory:")
+    db.add_book("Dune", "Herbert", "Ace", "9780441013593", 1)
+    for name in ("Ann", "Ben", "Cat", "Dan"):
+        db.add_member(name, f"{name.lower()}@example.com", "", "")
+    assert db.issue_book(1, 1)
+    return db
+
+
+def queue(db):
+    return [(hold[2], hold[4]) for hold in db.get_active_holds()]
+
+
+def test_place_hold_only_when_unavailable_and_once_per_member():
+    db = make_library()
+    db.add_book("Emma", "Austen", "Penguin", "9780141439587", 1)
+
+    assert not db.place_hold(2, 2)
+    assert db.place_hold(1, 2)
+    assert not db.place_hold(1, 2)
+    db.update_member_status(3, "Inactive")
+    assert not db.place_hold(1, 3)
+
+
+def test_return_allocates_to_priority_then_fifo():
+    db = make_library()
+    assert db.place_hold(1, 2)
+    assert db.place_hold(1, 3, priority=1)
+    assert db.place_hold(1, 4)
+
+    assert db.return_book(1)
+
+    assert queue(db) == [("Cat", "Ready"), ("Ben", "Waiting"), ("Dan", "Waiting")]
+    # The copy is set aside for Cat, not put back on the shelf
+    assert db.get_book_by_id(1)[6] == 0
+
+
+def test_return_without_holds_restores_copy():
+    db = make_library()
+
+    assert db.return_book(1)
+    assert not db.return_book(1)
+    assert db.get_book_by_id(1)[6] == 1
+
+
+def test_collect_hold_issues_the_set_aside_copy():
+    db = make_library()
+    assert db.place_hold(1, 2)
+    assert db.return_book(1)
+
+    assert db.collect_hold(1)
+    assert not db.collect_hold(1)
+    assert queue(db) == []
+    assert [issue[2] for issue in db.get_active_issues()] == ["Ben"]
+    assert db.get_book_by_id(1)[6] == 0
+
+
+def test_expired_hold_passes_copy_to_next_in_queue():
+    db = make_library()
+    assert db.place_hold(1, 2)
+    assert db.place_hold(1, 3)
+    assert db.return_book(1, hold_days=-1)
+
+    assert db.expire_holds() == 1
+    assert queue(db) == [("Cat", "Ready")]
+
+
+def test_expired_hold_without_queue_restores_copy():
+    db = make_library()
+    assert db.place_hold(1, 2)
+    assert db.return_book(1, hold_days=-1)
+
+    assert db.expire_holds() == 1
+    assert queue(db) == []
+    assert db.get_book_by_id(1)[6] == 1
+
+
+def test_return_expires_lapsed_holds_first():
+    db = make_library()
+    db.add_book("Emma", "Austen", "Penguin", "9780141439587", 1)
+    assert db.issue_book(2, 1)
+    assert db.place_hold(1, 2)
+    assert db.return_book(1, hold_days=-1)
+
+    # Returning an unrelated book releases Ben's lapsed copy of Dune
+    assert db.return_book(2)
+    assert queue(db) == []
+    assert db.get_book_by_id(1)[6] == 1
+
+
+def test_cancel_ready_hold_passes_copy_on():
+    db = make_library()
+    assert db.place_hold(1, 2)
+    assert db.place_hold(1, 3)
+    assert db.return_book(1)
+
+    assert db.cancel_hold(1)
+    assert not db.cancel_hold(1)
+    assert queue(db) == [("Cat", "Ready")]
+
+
+def test_deleting_member_cancels_their_holds():
+    db = make_library()
+    assert db.place_hold(1, 2)
+    assert db.place_hold(1, 3)
+    assert db.return_book(1)
+
+    assert db.delete_member(2)
+    assert queue(db) == [("Cat", "Ready")]
+
+
+def test_deactivating_member_cancels_their_holds():
+    db = make_library()
+    assert db.place_hold(1, 2)
+    assert db.return_book(1)
+
+    assert db.update_member_status(2, "Inactive")
+    assert queue(db) == []
+    assert db.get_book_by_id(1)[6] == 1
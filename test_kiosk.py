@@ -0,0 +1,148 @@
+# test_kiosk.py
+import os
+from database import Database
+from kiosk import KioskDatabase
+
+
+def make_library(tmp_path):
+    """A primary on a 'share' directory that can be unmounted by renaming it"""
+    share = tmp_path / "share"
+    share.mkdir()
+    primary = Database(str(share / "library.db"))
+    primary.add_book("Dune", "Herbert", "Ace", "9780441013593", 1)
+    primary.add_book("Emma", "Austen", "Penguin", "9780141439587", 5)
+    primary.add_member("Ann", "ann@example.com", "", "")
+    kiosk = KioskDatabase(str(share / "library.db"), str(tmp_path / "replica.db"))
+    return primary, kiosk, share
+
+
+def unmount(share):
+    os.rename(share, str(share) + "_down")
+
+
+def mount(share):
+    os.rename(str(share) + "_down", share)
+
+
+def test_missing_primary_stays_offline(tmp_path):
+    kiosk = KioskDatabase(str(tmp_path / "missing.db"), str(tmp_path / "replica.db"))
+
+    assert kiosk.offline
+    assert kiosk.sync() is None
+    assert not (tmp_path / "missing.db").exists()
+
+
+def test_offline_reads_come_from_replica(tmp_path):
+    primary, kiosk, share = make_library(tmp_path)
+    unmount(share)
+
+    assert len(kiosk.get_all_books()) == 2
+    assert kiosk.offline
+
+
+def test_sync_replays_journal_and_flags_conflicts(tmp_path):
+    primary, kiosk, share = make_library(tmp_path)
+    unmount(share)
+
+    # Offline: a new member borrows the last copy of Dune, returns it, and a copy of Emma
+    assert kiosk.add_member("Ben", "ben@example.com", "", "")
+    ben = [m for m in kiosk.get_all_members() if m[1] == "Ben"][0][0]
+    assert kiosk.issue_book(1, ben)
+    dune_issue = kiosk.get_open_issue_for_book(1)[0]
+    assert kiosk.return_book(dune_issue)
+    assert kiosk.issue_book(1, ben)
+    assert kiosk.issue_book(2, ben)
+
+    # Meanwhile the primary registers its own member and lends Dune elsewhere
+    mount(share)
+    primary.add_member("Cat", "cat@example.com", "", "")
+    assert primary.issue_book(1, 1)
+
+    result = kiosk.sync()
+
+    assert result['applied'] == 2
+    assert result['conflicts'] == 3
+    assert not kiosk.offline
+    assert [c[3] for c in kiosk.get_conflicts()] == [
+        "No copies available on primary",
+        "Depends on a conflicted offline issue",
+        "No copies available on primary",
+    ]
+
+    # Ben was remapped past Cat, and only the Emma issue reached the primary
+    members = {m[1]: m[0] for m in primary.get_all_members()}
+    assert members == {"Ann": 1, "Cat": 2, "Ben": 3}
+    issues = primary.get_active_issues()
+    assert [(i[1], i[2]) for i in issues] == [("Dune", "Ann"), ("Emma", "Ben")]
+    assert primary.get_book_by_id(2)[6] == 4
+
+    # The replica now matches the primary, offline-only rows included
+    assert kiosk.replica.get_all_members() == primary.get_all_members()
+    assert kiosk.replica.get_all_books() == primary.get_all_books()
+    assert kiosk.replica.get_active_issues() == issues
+
+
+def test_replayed_batch_is_not_applied_twice(tmp_path):
+    primary, kiosk, share = make_library(tmp_path)
+    unmount(share)
+    assert kiosk.issue_book(2, 1)
+    mount(share)
+
+    # Primary commits, then the journal update on the replica is lost
+    assert kiosk.push_journal() == (1, 0)
+    conn = kiosk.replica.connect()
+    conn.execute("UPDATE journal SET status = 'Pending'")
+    conn.commit()
+    conn.close()
+
+    assert kiosk.sync()['applied'] == 1
+    assert len(primary.get_active_issues()) == 1
+    assert primary.get_book_by_id(2)[6] == 4
+
+
+def test_pull_only_fetches_changed_rows(tmp_path):
+    primary, kiosk, share = make_library(tmp_path)
+
+    assert kiosk.sync()['pulled'] == 0
+    primary.update_member_status(1, "Inactive")
+
+    assert kiosk.sync()['pulled'] == 1
+    assert kiosk.replica.get_member_by_id(1)[6] == "Inactive"
+
+
+def test_dismiss_conflict(tmp_path):
+    primary, kiosk, share = make_library(tmp_path)
+    unmount(share)
+    assert kiosk.issue_book(1, 1)
+    mount(share)
+    assert primary.issue_book(1, 1)
+    kiosk.sync()
+
+    entry_id = kiosk.get_conflicts()[0][0]
+    assert kiosk.dismiss_conflict(entry_id)
+    assert kiosk.get_conflicts() == []
+
+
+def test_issue_to_member_removed_on_primary_conflicts(tmp_path):
+    primary, kiosk, share = make_library(tmp_path)
+    unmount(share)
+    assert kiosk.issue_book(2, 1)
+    mount(share)
+    assert primary.delete_member(1)
+
+    result = kiosk.sync()
+
+    assert result['applied'] == 0
+    assert kiosk.get_conflicts()[0][3] == "Member deleted or inactive on primary"
+    assert primary.get_book_by_id(2)[6] == 5
+
+
+def test_online_issue_can_be_returned_after_share_drops(tmp_path):
+    primary, kiosk, share = make_library(tmp_path)
+    assert kiosk.issue_book(2, 1)
+    unmount(share)
+
+    issue = kiosk.get_open_issue_for_book(2)
+    assert kiosk.offline
+    assert issue is not None
+    assert kiosk.return_book(issue[0])
@@ -0,0 +1,59 @@
+# test_scanner.py
+from types import SimpleNamespace
+from database import Database
+from scanner import ScanBuffer
+
+
+def keys(text, start=1000, gap=5):
+    """Key events for text followed by Return, gap milliseconds apart"""
+    events = [SimpleNamespace(char=char, keysym=char, time=start + i * gap) for i, char in enumerate(text)]
+    events.append(SimpleNamespace(char="\r", keysym="Return", time=start + len(text) * gap))
+    return events
+
+
+def feed_all(buffer, events):
+    return [buffer.feed(event) for event in events]
+
+
+def test_fast_burst_completes_scan():
+    results = feed_all(ScanBuffer(), keys("9780441013593"))
+
+    assert results[-1] == "9780441013593"
+    assert results[:-1] == [None] * 13
+
+
+def test_slow_typing_never_completes_scan():
+    results = feed_all(ScanBuffer(), keys("9780441013593", gap=200))
+
+    assert results == [None] * 14
+
+
+def test_one_character_card_completes_scan():
+    assert feed_all(ScanBuffer(), keys("7"))[-1] == "7"
+
+
+def test_slow_prefix_is_dropped_from_burst():
+    buffer = ScanBuffer()
+    feed_all(buffer, keys("12", gap=300)[:-1])
+
+    assert feed_all(buffer, keys("42", start=5000))[-1] == "42"
+
+
+def test_exact_isbn_and_open_issue_lookups():
+    db = Database(":memory:")
+    db.add_book("Dune", "Herbert", "Ace", "9780441013593", 2)
+    db.add_member("Ann", "ann@example.com", "", "")
+    db.add_member("Ben", "ben@example.com", "", "")
+
+    book = db.get_book_by_isbn("9780441013593")
+    assert book[1] == "Dune"
+    assert db.get_book_by_isbn("978044101359") is None
+    assert db.get_open_issue_for_book(book[0]) is None
+
+    assert db.issue_book(book[0], 1)
+    assert db.issue_book(book[0], 2)
+    assert db.get_open_issue_for_book(book[0])[2] == "Ann"
+    assert db.get_open_issue_for_book(book[0], 2)[2] == "Ben"
+
+    assert db.return_book(1)
+    assert db.get_open_issue_for_book(book[0], 1) is None